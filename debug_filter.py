@@ -14,9 +14,11 @@ def analyze_filter():
     
     b_float = signal.firwin(numtaps, [low_fc, high_fc], pass_zero=False, window="hamming")
     
-    # Calculate response at 100 Hz
-    w, h = signal.freqz(b_float, worN=[100/nyquist*np.pi])
-    gain_at_100 = np.abs(h[0])
+    # Calculate response at 100 Hz (single point: direct DTFT evaluation)
+    omega = 100/nyquist*np.pi
+    kernel = np.exp(-1j*omega*np.arange(numtaps))
+    h = np.dot(b_float, kernel)
+    gain_at_100 = np.abs(h)
     db_at_100 = 20*np.log10(gain_at_100)
     
     print(f"Design Parameters: Fs={fs}, Passband={fc} Hz, Taps={numtaps}")
@@ -24,20 +26,16 @@ def analyze_filter():
 
     # Check actual HEX coeffs
     try:
-        with open("fir_coeffs_q15.hex", "r") as f:
-            lines = f.readlines()
-        
-        coeffs = []
-        for line in lines:
-            val = int(line.strip(), 16)
-            if val > 32767:
-                val -= 65536
-            coeffs.append(val)
-        
-        coeffs = np.array(coeffs) / 32768.0
+        raw = np.loadtxt("fir_coeffs_q15.hex", dtype=str, ndmin=1)
+        vals = np.array([int(s, 16) for s in raw], dtype=np.int32)
+
+        # Branchless 16-bit two's complement sign extension
+        vals = ((vals & 0xFFFF) ^ 0x8000) - 0x8000
+
+        coeffs = vals.astype(np.float64) / 32768.0
         
-        w_hex, h_hex = signal.freqz(coeffs, worN=[100/nyquist*np.pi])
-        gain_hex = np.abs(h_hex[0])
+        h_hex = np.dot(coeffs, np.exp(-1j*omega*np.arange(len(coeffs))))
+        gain_hex = np.abs(h_hex)
         db_hex = 20*np.log10(gain_hex)
         
         print(f"Actual HEX Coeffs Gain at 100 Hz: {gain_hex:.4f} ({db_hex:.2f} dB)")
@@ -1,20 +1,52 @@
+import argparse
+import functools
+
 import numpy as np
+import numpy.polynomial.polynomial as P
 import scipy.signal as signal
 import matplotlib.pyplot as plt
 
+try:
+    from joblib import Parallel, delayed
+    HAS_JOBLIB = True
+except ImportError:
+    HAS_JOBLIB = False
+
+try:
+    import cupy as cp
+    HAS_GPU = True
+except ImportError:
+    HAS_GPU = False
+
 # ============================================================
 # FIR design + quantization (Q1.15)
 # ============================================================
 
+@functools.lru_cache(maxsize=32)
+def _cached_firwin(numtaps: int, low: float, high: float, window: str = "hamming"):
+    """
+    Memoized bandpass firwin. The returned array is shared between
+    callers, so it is marked read-only.
+    """
+    b = signal.firwin(numtaps, [low, high], pass_zero=False, window=window)
+    b.setflags(write=False)
+    return b
+
+
 def design_bandpass_fir_filter(
     fs: int,
     fc: list,
     numtaps: int,
-    frac_bits: int = 15
+    frac_bits: int = 15,
+    n_freqs: int | None = 8192,
+    window: str = "hamming",
+    verbose: bool = True
 ):
     """
     Design bandpass FIR filter and quantize to Q1.<frac_bits>.
     Intended for Verilog FIR with arithmetic shift right by frac_bits.
+    Also returns the quantized frequency response (w, h) sampled on
+    n_freqs + 1 points from DC to Nyquist (both None if n_freqs is None).
     """
 
     nyquist = 0.5 * fs
@@ -24,39 +56,202 @@ def design_bandpass_fir_filter(
     # --------------------------------------------------------
     # 1) Floating-point FIR prototype
     # --------------------------------------------------------
-    b_float = signal.firwin(
-        numtaps,
-        [low_fc, high_fc],
-        pass_zero=False,
-        window="hamming"
-    )
+    b_float = _cached_firwin(numtaps, low_fc, high_fc, window=window)
+
+    b_q, b_rec, w, h = quantize_fir(b_float, fs, frac_bits, n_freqs, verbose)
+
+    # The cached prototype is shared and read-only; hand out a copy
+    return b_q, b_rec, b_float.copy(), w, h
+
+
+def quantize_fir(
+    b_float: np.ndarray,
+    fs: int,
+    frac_bits: int = 15,
+    n_freqs: int | None = 8192,
+    verbose: bool = True
+):
+    """
+    Quantize floating-point FIR taps to Q1.<frac_bits> and compute the
+    quantized frequency response on n_freqs + 1 points (skipped, with
+    w and h returned as None, if n_freqs is None).
+    """
 
     # --------------------------------------------------------
     # 2) Quantize to Q1.15
     # --------------------------------------------------------
     scale = 1 << frac_bits
-    b_q = np.round(b_float * scale).astype(np.int32)
+    b_q = np.rint(b_float * scale)
 
-    # Saturate to int16
-    b_q = np.clip(b_q, -32768, 32767).astype(np.int16)
+    # Saturate to int16 (in place, single cast)
+    np.maximum(b_q, -32768, out=b_q)
+    np.minimum(b_q, 32767, out=b_q)
+    b_q = b_q.astype(np.int16)
 
     # --------------------------------------------------------
     # 3) Frequency response after quantization
     # --------------------------------------------------------
     b_rec = b_q.astype(np.float64) / scale
-    w, h = signal.freqz(b_rec, worN=8192, fs=fs)
 
-    print("===================================")
-    print("FIR quantization summary")
-    print(f"  NTAPS        : {numtaps}")
-    print(f"  Q format     : Q1.{frac_bits}")
-    print(f"  Scale factor : {scale}")
-    print(f"  Max coeff    : {np.max(b_q)}")
-    print(f"  Min coeff    : {np.min(b_q)}")
-    print(f"  Max |H(f)|   : {np.max(np.abs(h)):.4f}")
-    print("===================================")
+    # Real FIR: a single rfft over a 2N grid is equivalent to freqz on
+    # N points (plus Nyquist), without the polynomial evaluation.
+    # Q1.15 values are exact in float32, so the response is computed
+    # in single precision.
+    if n_freqs is None:
+        w, h = None, None
+    else:
+        h = np.fft.rfft(_fold_taps(b_rec, 2 * n_freqs).astype(np.float32))
+        w = _freq_grid(fs, n_freqs)
+
+    if verbose:
+        print("===================================")
+        print("FIR quantization summary")
+        print(f"  NTAPS        : {len(b_float)}")
+        print(f"  Q format     : Q1.{frac_bits}")
+        print(f"  Scale factor : {scale}")
+        print(f"  Max coeff    : {np.max(b_q)}")
+        print(f"  Min coeff    : {np.min(b_q)}")
+        if h is not None:
+            print(f"  Max |H(f)|   : {np.max(np.abs(h)):.4f}")
+        print("===================================")
+
+    return b_q, b_rec, w, h
+
+
+def _fold_taps(b: np.ndarray, n_fft: int):
+    """
+    Zero-pad or wrap taps to length n_fft. Summing taps modulo n_fft
+    (time-domain aliasing) keeps the n_fft-point DFT equal to the exact
+    response samples when the filter is longer than the FFT.
+    """
+    if len(b) <= n_fft:
+        return np.pad(b, (0, n_fft - len(b)))
+    b = np.pad(b, (0, -len(b) % n_fft))
+    return b.reshape(-1, n_fft).sum(axis=0)
+
+
+def _freq_grid(fs: int, n_freqs: int):
+    """
+    Frequency axis matching the rfft response of quantize_fir.
+    """
+    return np.linspace(0, fs / 2, n_freqs + 1, dtype=np.float32)
+
 
-    return b_q, b_rec, b_float
+def _sweep_design(fs, fc, numtaps, frac_bits, window, n_freqs):
+    b_q, b_rec, b_float, _, h = design_bandpass_fir_filter(
+        fs, fc, numtaps, frac_bits,
+        n_freqs=n_freqs, window=window, verbose=False
+    )
+    return b_q, b_rec, b_float, h
+
+
+def _sweep_quantize(b_float, fs, frac_bits, n_freqs):
+    b_q, b_rec, _, h = quantize_fir(
+        b_float, fs, frac_bits, n_freqs=n_freqs, verbose=False
+    )
+    return b_q, b_rec, b_float, h
+
+
+def _firwin_bandpass_batch(numtaps, low, high, window="hamming", xp=np):
+    """
+    Bandpass firwin for a batch of designs sharing numtaps and window,
+    evaluated as one (n_designs, numtaps) expression on array module xp
+    (NumPy or CuPy). low/high are cutoffs normalized to Nyquist; follows
+    scipy.signal.firwin(pass_zero=False, scale=True).
+    """
+    low = xp.asarray(low, dtype=xp.float64)[:, None]
+    high = xp.asarray(high, dtype=xp.float64)[:, None]
+    m = xp.arange(numtaps, dtype=xp.float64) - 0.5 * (numtaps - 1)
+
+    h = high * xp.sinc(high * m) - low * xp.sinc(low * m)
+    h *= xp.asarray(signal.get_window(window, numtaps, fftbins=False))
+
+    # Unit gain at the passband center (0 < low < high < 1 for firwin)
+    scale_freq = 0.5 * (low + high)
+    h /= xp.sum(h * xp.cos(xp.pi * m * scale_freq), axis=1, keepdims=True)
+    return h
+
+
+def _firwin_sweep_gpu(fs, jobs):
+    """
+    GPU prototypes for sweep jobs, one batched kernel per
+    (numtaps, window) group, copied back to the host once per group.
+    """
+    nyquist = 0.5 * fs
+    groups = {}
+    for i, (fc, numtaps, window) in enumerate(jobs):
+        groups.setdefault((numtaps, window), []).append(i)
+
+    protos = [None] * len(jobs)
+    for (numtaps, window), idx in groups.items():
+        low = [jobs[i][0][0] / nyquist for i in idx]
+        high = [jobs[i][0][1] / nyquist for i in idx]
+        b = cp.asnumpy(_firwin_bandpass_batch(numtaps, low, high, window, xp=cp))
+        for i, row in zip(idx, b):
+            protos[i] = row
+    return protos
+
+
+def design_sweep(
+    fs: int,
+    cutoff_pairs: list,
+    tap_list: list,
+    windows: tuple = ("hamming",),
+    frac_bits: int = 15,
+    n_freqs: int | None = None,
+    n_jobs: int = -1,
+    use_gpu: bool = False
+):
+    """
+    Design and quantize every (fc, numtaps, window) combination.
+    Designs are independent, so they are spread over n_jobs workers
+    with joblib when it is installed; otherwise they run serially.
+
+    With use_gpu (and CuPy installed) the firwin prototypes are computed
+    on the GPU, batched per (numtaps, window), and only quantization and
+    the response run on the CPU workers. GPU prototypes agree with
+    scipy's firwin to rounding error, so a tap lying exactly on a
+    half-LSB boundary may quantize differently than on the CPU path.
+
+    Returns (w, designs): the frequency grid shared by all designs and
+    a list of (b_q, b_rec, b_float, h) tuples following the iteration
+    order cutoff -> taps -> window. Responses are only computed when
+    n_freqs is given (w and every h are None otherwise), since a full
+    grid per design dominates memory on large sweeps.
+    """
+    jobs = [
+        (tuple(fc), numtaps, window)
+        for fc in cutoff_pairs
+        for numtaps in tap_list
+        for window in windows
+    ]
+
+    w = None if n_freqs is None else _freq_grid(fs, n_freqs)
+
+    if use_gpu and HAS_GPU:
+        protos = _firwin_sweep_gpu(fs, jobs)
+        if HAS_JOBLIB:
+            designs = Parallel(n_jobs=n_jobs)(
+                delayed(_sweep_quantize)(b_float, fs, frac_bits, n_freqs)
+                for b_float in protos
+            )
+        else:
+            designs = [
+                _sweep_quantize(b_float, fs, frac_bits, n_freqs)
+                for b_float in protos
+            ]
+    elif HAS_JOBLIB:
+        designs = Parallel(n_jobs=n_jobs)(
+            delayed(_sweep_design)(fs, fc, numtaps, frac_bits, window, n_freqs)
+            for fc, numtaps, window in jobs
+        )
+    else:
+        designs = [
+            _sweep_design(fs, fc, numtaps, frac_bits, window, n_freqs)
+            for fc, numtaps, window in jobs
+        ]
+
+    return w, designs
 
 
 # ============================================================
@@ -65,12 +260,16 @@ def design_bandpass_fir_filter(
 
 def generate_test_signal(fs: int, duration: float, frequencies: list):
     t = np.arange(0, duration, 1 / fs)
-    x = np.zeros_like(t)
+    two_pi_t = (2.0 * np.pi) * t
+    freqs = np.asarray(frequencies, dtype=np.float64)
 
-    for f in frequencies:
-        x += np.sin(2 * np.pi * f * t)
+    # One (K, N) sine evaluation instead of K separate passes, reduced
+    # straight into an uninitialized output buffer
+    x = np.empty_like(t)
+    np.sum(np.sin(freqs[:, None] * two_pi_t), axis=0, out=x)
+    x /= freqs.size
 
-    return t, x / len(frequencies)
+    return t, x
 
 
 # ============================================================
@@ -82,9 +281,8 @@ def export_coeffs_hex(coeffs: np.ndarray, filename: str):
     Export coefficients in HEX (one per line).
     Compatible with $readmemh in Verilog.
     """
-    with open(filename, "w") as f:
-        for c in coeffs:
-            f.write(f"{np.uint16(c):04X}\n")
+    words = np.asarray(coeffs).astype(np.int16).view(np.uint16)
+    np.savetxt(filename, words, fmt="%04X")
 
     print(f"[OK] HEX coefficients written to {filename}")
 
@@ -93,19 +291,101 @@ def export_coeffs_decimal(coeffs: np.ndarray, filename: str):
     """
     Export coefficients in signed decimal (debug/reference).
     """
-    with open(filename, "w") as f:
-        for c in coeffs:
-            f.write(f"{int(c)}\n")
+    np.savetxt(filename, np.asarray(coeffs).astype(np.int32), fmt="%d")
 
     print(f"[OK] Decimal coefficients written to {filename}")
 
 
+# ============================================================
+# Diagnostic plots
+# ============================================================
+
+def plot_diagnostics(
+    b_rec: np.ndarray,
+    w: np.ndarray,
+    h: np.ndarray,
+    t: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    plot_zeros: bool = False
+):
+    """
+    Plot impulse/frequency response and the filtered test signal.
+    The zero plot is optional: root finding on a long FIR costs far
+    more than the design itself.
+    """
+    fig = plt.figure(figsize=(14, 10))
+
+    # 2x3 grid with the zero plot; otherwise 3 panels on top and 2
+    # wider ones below, so no cell is left empty
+    if plot_zeros:
+        gs = fig.add_gridspec(2, 3)
+        slots = [gs[i // 3, i % 3] for i in range(6)]
+    else:
+        gs = fig.add_gridspec(2, 6)
+        slots = [gs[0, 0:2], gs[0, 2:4], gs[0, 4:6], gs[1, 0:3], gs[1, 3:6]]
+    panels = iter(slots)
+
+    # Zeros
+    if plot_zeros:
+        ax = fig.add_subplot(next(panels))
+        z = P.polyroots(b_rec[::-1])
+        ax.scatter(np.real(z), np.imag(z), s=30)
+        ax.add_patch(plt.Circle((0, 0), 1, fill=False, linestyle="--"))
+        ax.set_title("Zero plot")
+        ax.axis("equal")
+        ax.grid()
+
+    # Impulse response
+    ax = fig.add_subplot(next(panels))
+    ax.stem(b_rec, basefmt=" ")
+    ax.set_title("Impulse response")
+    ax.grid()
+
+    # Magnitude
+    ax = fig.add_subplot(next(panels))
+    ax.plot(w, 20 * np.log10(np.maximum(np.abs(h), 1e-12)))
+    ax.set_title("Magnitude response (dB)")
+    ax.grid()
+
+    # Phase
+    ax = fig.add_subplot(next(panels))
+    ax.plot(w, np.unwrap(np.angle(h)))
+    ax.set_title("Phase response")
+    ax.grid()
+
+    # Input
+    ax = fig.add_subplot(next(panels))
+    ax.plot(t[:500], x[:500])
+    ax.set_title("Input signal")
+    ax.grid()
+
+    # Output
+    ax = fig.add_subplot(next(panels))
+    ax.plot(t[:500], y[:500])
+    ax.set_title("Filtered output")
+    ax.grid()
+
+    plt.tight_layout()
+    plt.show()
+
+
 # ============================================================
 # Main
 # ============================================================
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(
+        description="Design and export the Q1.15 bandpass FIR coefficients"
+    )
+    parser.add_argument(
+        "--plot-zeros",
+        action="store_true",
+        help="Include the zero plot (root finding on all taps, slow)"
+    )
+    args = parser.parse_args()
+
     # --------------------------------------------------------
     # Configuration
     # --------------------------------------------------------
@@ -117,7 +397,7 @@ if __name__ == "__main__":
     # --------------------------------------------------------
     # FIR design + quantization
     # --------------------------------------------------------
-    b_q15, b_rec, b_float = design_bandpass_fir_filter(
+    b_q15, b_rec, b_float, w, h = design_bandpass_fir_filter(
         fs, fc, numtaps, frac_bits
     )
 
@@ -125,55 +405,16 @@ if __name__ == "__main__":
     # Verification with test signal
     # --------------------------------------------------------
     t, x = generate_test_signal(fs, 2.0, [10, 100])
-    y = signal.lfilter(b_rec, 1.0, x)
+    # Pure FIR (a = 1): overlap-add convolution, truncated to the input
+    # length, matches lfilter to floating-point rounding error (FFT-based).
+    # lfilter is only needed for IIR sections or when streaming with
+    # initial state (zi).
+    y = signal.oaconvolve(x, b_rec, mode="full")[:len(x)]
 
     # --------------------------------------------------------
     # Plots
     # --------------------------------------------------------
-    fig = plt.figure(figsize=(14, 10))
-
-    # Zeros
-    ax1 = plt.subplot(2, 3, 1)
-    z = np.roots(b_rec)
-    ax1.scatter(np.real(z), np.imag(z), s=30)
-    ax1.add_patch(plt.Circle((0, 0), 1, fill=False, linestyle="--"))
-    ax1.set_title("Zero plot")
-    ax1.axis("equal")
-    ax1.grid()
-
-    # Impulse response
-    ax2 = plt.subplot(2, 3, 2)
-    ax2.stem(b_rec, basefmt=" ")
-    ax2.set_title("Impulse response")
-    ax2.grid()
-
-    # Magnitude
-    ax3 = plt.subplot(2, 3, 3)
-    w, h = signal.freqz(b_rec, fs=fs)
-    ax3.plot(w, 20 * np.log10(np.maximum(np.abs(h), 1e-12)))
-    ax3.set_title("Magnitude response (dB)")
-    ax3.grid()
-
-    # Phase
-    ax4 = plt.subplot(2, 3, 4)
-    ax4.plot(w, np.unwrap(np.angle(h)))
-    ax4.set_title("Phase response")
-    ax4.grid()
-
-    # Input
-    ax5 = plt.subplot(2, 3, 5)
-    ax5.plot(t[:500], x[:500])
-    ax5.set_title("Input signal")
-    ax5.grid()
-
-    # Output
-    ax6 = plt.subplot(2, 3, 6)
-    ax6.plot(t[:500], y[:500])
-    ax6.set_title("Filtered output")
-    ax6.grid()
-
-    plt.tight_layout()
-    plt.show()
+    plot_diagnostics(b_rec, w, h, t, x, y, plot_zeros=args.plot_zeros)
 
     # --------------------------------------------------------
     # Export for RTL
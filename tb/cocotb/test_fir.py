@@ -1,5 +1,7 @@
 import os
-import csv
+import functools
+import tempfile
+from dataclasses import dataclass
 import cocotb
 import numpy as np
 import plotly.graph_objects as go
@@ -7,25 +9,176 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, Timer
 from plotly.subplots import make_subplots
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 FRAC_BITS = 15
 SCALE = 1 << FRAC_BITS
 
 
-def float_to_q15(x):
-    x = np.clip(x, -0.999969, 0.999969)
-    return np.round(x * SCALE).astype(np.int16)
-
-
-def q15_to_float(q):
-    return q.astype(np.int16) / float(SCALE)
+def _float_to_q15_np(x):
+    x = np.asarray(x, dtype=np.float64)
+    buf = np.empty_like(x)
+    np.maximum(x, -0.999969, out=buf)
+    np.minimum(buf, 0.999969, out=buf)
+    buf *= SCALE
+    np.rint(buf, out=buf)
+    return buf.astype(np.int16, copy=False)
+
+
+def _q15_to_float_np(q):
+    q = np.asarray(q).astype(np.int32, copy=False)
+    return np.multiply(q, 1.0 / SCALE)
+
+
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _float_to_q15_nb(x):
+        out = np.empty(x.shape[0], dtype=np.int16)
+        for i in range(x.shape[0]):
+            v = x[i]
+            if v > 0.999969:
+                v = 0.999969
+            elif v < -0.999969:
+                v = -0.999969
+            out[i] = np.int16(np.rint(v * SCALE))
+        return out
+
+    @njit(cache=True, nogil=True)
+    def _q15_to_float_nb(q):
+        out = np.empty(q.shape[0], dtype=np.float64)
+        for i in range(q.shape[0]):
+            out[i] = q[i] / SCALE
+        return out
+
+    def float_to_q15(x):
+        x = np.asarray(x, dtype=np.float64)
+        return _float_to_q15_nb(x.ravel()).reshape(x.shape)
+
+    def q15_to_float(q):
+        q = np.asarray(q).astype(np.int32)
+        return _q15_to_float_nb(q.ravel()).reshape(q.shape)
+else:
+    float_to_q15 = _float_to_q15_np
+    q15_to_float = _q15_to_float_np
 
 
 # Resolve dataset folder relative to this file
 DATASET_FOLDER = os.path.join(os.path.dirname(__file__), "../../test_files")
+COEFF_FILE = os.path.join(os.path.dirname(__file__), "../../src/fir_coeffs_q15.hex")
+
+
+def load_coeffs_q15(filename=COEFF_FILE):
+    raw = np.loadtxt(filename, dtype=str, ndmin=1)
+    vals = np.array([int(s, 16) for s in raw], dtype=np.int64)
+    return (((vals & 0xFFFF) ^ 0x8000) - 0x8000).astype(np.int16)
+
+
+# ============================================================
+# Bit-exact Q15 FIR reference (matches fir.v: full-precision
+# accumulate, arithmetic shift right by FRAC_BITS, 32-bit output
+# with no saturation)
+# ============================================================
+
+def _fir_ref_q15_np(x, h, frac_bits):
+    acc = np.convolve(x.astype(np.int64), h.astype(np.int64))[:len(x)]
+    return (acc >> frac_bits).astype(np.int32)
+
+
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def fir_ref_q15(x, h, frac_bits):
+        n_samples = x.shape[0]
+        n_taps = h.shape[0]
+        y = np.empty(n_samples, dtype=np.int32)
+        for n in range(n_samples):
+            acc = np.int64(0)
+            for k in range(min(n_taps, n + 1)):
+                acc += np.int64(x[n - k]) * np.int64(h[k])
+            y[n] = np.int32(acc >> frac_bits)
+        return y
+else:
+    fir_ref_q15 = _fir_ref_q15_np
+
+
+def _read_lfp_bin(bin_path):
+    """
+    Read a cached trace written by _write_lfp_bin. Returns None if the
+    file is truncated or its length header does not match.
+    """
+    with open(bin_path, "rb") as f:
+        header = np.fromfile(f, dtype=np.int64, count=1)
+        if header.size != 1:
+            return None
+        data = np.fromfile(f, dtype=np.int16)
+    return data if data.size == header[0] else None
+
+
+def _write_lfp_bin(bin_path, data):
+    """
+    Write [int64 sample count][int16 samples] to a temp file in the same
+    folder and atomically move it into place, so concurrent or
+    interrupted runs never leave a partial cache behind.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(bin_path),
+        prefix=os.path.basename(bin_path) + ".",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.array([data.size], dtype=np.int64).tofile(f)
+            data.tofile(f)
+        os.replace(tmp_path, bin_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@functools.lru_cache(maxsize=8)
+def _load_lfp_cached(path, mtime):
+    """
+    Parse an int16 LFP text trace, keeping a raw binary copy next to it
+    (<name>.int16.bin) that is reused while newer than the text file.
+    The binary copy is best-effort; it is skipped if it cannot be written.
+    `mtime` is only part of the cache key, so edits invalidate it.
+    """
+    bin_path = os.path.splitext(path)[0] + ".int16.bin"
+    data = None
+    if os.path.exists(bin_path) and os.path.getmtime(bin_path) >= mtime:
+        data = _read_lfp_bin(bin_path)
+
+    if data is None:
+        data = np.loadtxt(path, dtype=np.int16)
+        try:
+            _write_lfp_bin(bin_path, data)
+        except OSError:
+            # Read-only checkout/dataset: the binary copy is optional
+            pass
+
+    # The cached array is shared between calls
+    data.setflags(write=False)
+    return data
+
+
+def load_lfp(path):
+    return _load_lfp_cached(path, os.path.getmtime(path))
+
+
+@dataclass(slots=True)
+class TraceSet:
+    name: str
+    fs: float
+    t: np.ndarray
+    x_float: np.ndarray
+    x_q15: np.ndarray
 
 
 def load_dataset(signal_type="synthetic"):
-    signals = {}
+    signals = []
 
     if signal_type == "synthetic":
         fs = 2000.0
@@ -35,12 +188,13 @@ def load_dataset(signal_type="synthetic"):
         for f in freqs:
             t = np.arange(0, duration, 1.0 / fs)
             x = np.sin(2 * np.pi * f * t)
-            signals[f"sine_{int(f)}Hz"] = {
-                "fs": fs,
-                "t": t,
-                "x_float": x,
-                "x_q15": float_to_q15(x),
-            }
+            signals.append(TraceSet(
+                name=f"sine_{int(f)}Hz",
+                fs=fs,
+                t=t,
+                x_float=x,
+                x_q15=float_to_q15(x),
+            ))
 
     elif signal_type == "lfp":
         fs = 2000.0
@@ -49,13 +203,14 @@ def load_dataset(signal_type="synthetic"):
         ]
 
         for name in filenames:
-            data = np.loadtxt(f"{DATASET_FOLDER}/lfp/{name}", dtype=np.int16)
-            signals[name] = {
-                "fs": fs,
-                "t": np.arange(len(data)) / fs,
-                "x_float": q15_to_float(data),
-                "x_q15": data,
-            }
+            data = load_lfp(f"{DATASET_FOLDER}/lfp/{name}")
+            signals.append(TraceSet(
+                name=name,
+                fs=fs,
+                t=np.arange(len(data)) / fs,
+                x_float=q15_to_float(data),
+                x_q15=data,
+            ))
 
     else:
         raise ValueError("Unknown dataset")
@@ -81,28 +236,38 @@ async def run_fir(dut, x_q15):
 
     fir_out = []
 
-    for i, sample in enumerate(x_q15):
-        dut.s_axis_fir_tdata.value = int(sample)
-        dut.s_axis_fir_tvalid.value = 1
-        await RisingEdge(dut.clk)
-
-        if dut.m_axis_fir_tvalid.value:
-            val = int(dut.m_axis_fir_tdata.value.signed_integer)
+    # Convert once to native Python ints and alias the handles used in
+    # the per-cycle loop
+    x_list = np.asarray(x_q15).astype(np.int16).tolist()
+    clk = dut.clk
+    sdata = dut.s_axis_fir_tdata
+    svalid = dut.s_axis_fir_tvalid
+    mvalid = dut.m_axis_fir_tvalid
+    mdata = dut.m_axis_fir_tdata
+
+    for i, sample in enumerate(x_list):
+        sdata.value = sample
+        svalid.value = 1
+        await RisingEdge(clk)
+
+        if mvalid.value:
+            val = int(mdata.value.signed_integer)
             fir_out.append(val)
-            # print(f"Cycle {i}: In={int(sample)}, Out={val}")
+            # print(f"Cycle {i}: In={sample}, Out={val}")
 
     # Drain the pipeline
-    dut.s_axis_fir_tvalid.value = 0
+    svalid.value = 0
     # print("Input stream finished. Draining pipeline...")
     for i in range(300):
-        await RisingEdge(dut.clk)
-        if dut.m_axis_fir_tvalid.value:
-            val = int(dut.m_axis_fir_tdata.value.signed_integer)
+        await RisingEdge(clk)
+        if mvalid.value:
+            val = int(mdata.value.signed_integer)
             fir_out.append(val)
             # print(f"Drain cycle {i}: Out={val}")
 
     print(f"FIR run complete. Collected {len(fir_out)} samples.")
-    return np.array(fir_out, dtype=np.int16)
+    # fir.v drives a 32-bit output without saturating to Q15
+    return np.array(fir_out, dtype=np.int32)
 
 
 
@@ -122,30 +287,38 @@ async def test_fir_only(dut):
     await Timer(1, units="ns")
 
     signals = load_dataset(signal_type="synthetic")
+    coeffs_q15 = load_coeffs_q15()
 
-    for name, sig in signals.items():
+    for sig in signals:
+        name = sig.name
         dut._log.info(f"Testing FIR with signal: {name}")
 
-        t = sig["t"]
-        x_float = sig["x_float"]
-        x_q15 = sig["x_q15"]
+        t = sig.t
+        x_float = sig.x_float
+        x_q15 = sig.x_q15
 
         fir_q15 = await run_fir(dut, x_q15)
         fir_float = q15_to_float(fir_q15)
 
+        ref_q15 = fir_ref_q15(x_q15, coeffs_q15, FRAC_BITS)
+        np.testing.assert_array_equal(
+            fir_q15, ref_q15,
+            err_msg=f"[{name}] FIR output does not match Q15 reference",
+        )
+        dut._log.info(f"[{name}] {len(ref_q15)} samples match Q15 reference")
+
         csv_name = f"fir_output_{name}.csv"
-        with open(csv_name, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["n", "t", "input_q15", "input_float", "fir_q15", "fir_float"])
-            for i in range(len(fir_q15)):
-                w.writerow([
-                    i,
-                    float(t[i]),
-                    int(x_q15[i]),
-                    float(x_float[i]),
-                    int(fir_q15[i]),
-                    float(fir_float[i]),
-                ])
+        n = len(fir_q15)
+        np.savetxt(
+            csv_name,
+            np.column_stack([
+                np.arange(n), t[:n], x_q15[:n], x_float[:n], fir_q15, fir_float,
+            ]),
+            fmt=["%d", "%.9g", "%d", "%.9g", "%d", "%.9g"],
+            delimiter=",",
+            header="n,t,input_q15,input_float,fir_q15,fir_float",
+            comments="",
+        )
 
         dut._log.info(f"[{name}] CSV saved: {csv_name}")
 
@@ -159,15 +332,15 @@ async def test_fir_only(dut):
             ),
         )
 
-        fig.add_trace(go.Scatter(x=t[:len(fir_float)], y=x_float[:len(fir_float)],
-                                 name="Input (float)"), row=1, col=1)
-        fig.add_trace(go.Scatter(x=t[:len(fir_float)], y=fir_float,
-                                 name="FIR (float)"), row=1, col=1)
+        fig.add_trace(go.Scattergl(x=t[:len(fir_float)], y=x_float[:len(fir_float)],
+                                   name="Input (float)"), row=1, col=1)
+        fig.add_trace(go.Scattergl(x=t[:len(fir_float)], y=fir_float,
+                                   name="FIR (float)"), row=1, col=1)
 
-        fig.add_trace(go.Scatter(x=t[:len(fir_q15)], y=x_q15[:len(fir_q15)],
-                                 name="Input Q15"), row=2, col=1)
-        fig.add_trace(go.Scatter(x=t[:len(fir_q15)], y=fir_q15,
-                                 name="FIR Q15"), row=2, col=1)
+        fig.add_trace(go.Scattergl(x=t[:len(fir_q15)], y=x_q15[:len(fir_q15)],
+                                   name="Input Q15"), row=2, col=1)
+        fig.add_trace(go.Scattergl(x=t[:len(fir_q15)], y=fir_q15,
+                                   name="FIR Q15"), row=2, col=1)
 
         fig.update_layout(
             height=800,
@@ -177,7 +350,7 @@ async def test_fir_only(dut):
         )
 
         html_name = f"fir_output_{name}.html"
-        fig.write_html(html_name)
+        fig.write_html(html_name, include_plotlyjs="cdn", full_html=True)
 
         dut._log.info(f"[{name}] Plot saved: {html_name}")
 
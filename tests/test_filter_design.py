@@ -0,0 +1,83 @@
+import types
+
+import numpy as np
+import scipy.signal as signal
+
+import filter_design
+from filter_design import design_bandpass_fir_filter, design_sweep
+
+
+def test_response_matches_freqz_on_grid_shorter_than_filter():
+    # 2 * n_freqs < numtaps: the rfft must not drop the tail taps
+    fs, numtaps, n_freqs = 2000, 121, 32
+    _, b_rec, _, w, h = design_bandpass_fir_filter(
+        fs, [5, 50], numtaps, n_freqs=n_freqs, verbose=False
+    )
+
+    w_ref, h_ref = signal.freqz(
+        b_rec, worN=n_freqs + 1, include_nyquist=True, fs=fs
+    )
+
+    np.testing.assert_allclose(w, w_ref, rtol=1e-6)
+    np.testing.assert_allclose(h, h_ref, rtol=0, atol=1e-6)
+
+
+def test_sweep_response_matches_freqz_for_long_filters():
+    fs, n_freqs = 2000, 16
+    w, designs = design_sweep(
+        fs, [(5, 50)], [33, 121], n_freqs=n_freqs, n_jobs=1
+    )
+
+    assert len(designs) == 2
+    for _, b_rec, _, h in designs:
+        w_ref, h_ref = signal.freqz(
+            b_rec, worN=n_freqs + 1, include_nyquist=True, fs=fs
+        )
+        np.testing.assert_allclose(w, w_ref, rtol=1e-6)
+        np.testing.assert_allclose(h, h_ref, rtol=0, atol=1e-6)
+
+
+def test_float32_response_within_one_q15_lsb_of_float64():
+    frac_bits = 15
+    _, b_rec, _, w, h = design_bandpass_fir_filter(
+        2000, [5, 50], 121, frac_bits, verbose=False
+    )
+
+    assert b_rec.dtype == np.float64
+    assert h.dtype == np.complex64
+
+    h_ref = np.fft.rfft(b_rec, n=2 * (len(w) - 1))
+    np.testing.assert_allclose(h, h_ref, rtol=0, atol=1 / (1 << frac_bits))
+
+
+def test_batched_firwin_matches_scipy():
+    low = np.array([5, 10, 1, 300]) / 1000
+    high = np.array([50, 100, 999, 700]) / 1000
+
+    for numtaps, window in ((121, "hamming"), (120, "blackman")):
+        batch = filter_design._firwin_bandpass_batch(numtaps, low, high, window)
+        ref = np.array([
+            signal.firwin(numtaps, [lo, hi], pass_zero=False, window=window)
+            for lo, hi in zip(low, high)
+        ])
+        np.testing.assert_allclose(batch, ref, rtol=0, atol=1e-15)
+
+
+def test_gpu_sweep_path_matches_cpu(monkeypatch):
+    # Run the batched GPU branch with NumPy standing in for CuPy
+    cupy_like = types.SimpleNamespace(
+        **{name: getattr(np, name) for name in dir(np) if not name.startswith("_")},
+        asnumpy=np.asarray,
+    )
+    monkeypatch.setattr(filter_design, "cp", cupy_like, raising=False)
+    monkeypatch.setattr(filter_design, "HAS_GPU", True)
+
+    args = (2000, [(5, 50), (10, 100)], [61, 121], ("hamming", "hann"))
+    w_cpu, cpu = design_sweep(*args, n_freqs=64, n_jobs=1)
+    w_gpu, gpu = design_sweep(*args, n_freqs=64, n_jobs=1, use_gpu=True)
+
+    np.testing.assert_array_equal(w_gpu, w_cpu)
+    for (bq_g, _, bf_g, h_g), (bq_c, _, bf_c, h_c) in zip(gpu, cpu):
+        np.testing.assert_array_equal(bq_g, bq_c)
+        np.testing.assert_allclose(bf_g, bf_c, rtol=0, atol=1e-15)
+        np.testing.assert_allclose(h_g, h_c, rtol=0, atol=1e-6)